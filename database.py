@@ -1,135 +1,283 @@
 import sqlite3
 import datetime
-from typing import List, Dict, Optional
+from typing import List, Iterator, Optional, Set, Tuple
 import os
 
+# Article bodies run to many KB, so larger pages keep the btree shallower
+PAGE_SIZE = 8192
+
+# Pages skipped as too short are retried after this many days, in case the body
+# hadn't rendered yet or the post has since been unpaywalled
+SKIP_RETRY_DAYS = 7
+
+# Update re-scraped articles in place: INSERT OR REPLACE would delete the old row
+# and give it a new id, orphaning any summaries that point at it
+UPSERT_ARTICLE_SQL = '''
+    INSERT INTO articles (url, title, content, scraped_at, processed)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        title = excluded.title,
+        content = excluded.content,
+        scraped_at = excluded.scraped_at
+'''
+
 class SubstackDatabase:
     def __init__(self, db_path: str = "substack_articles.db"):
         self.db_path = db_path
+        # One connection for the lifetime of the object keeps SQLite's page cache warm
+        self._conn = self._connect()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the per-connection pragmas applied"""
+        # Autocommit mode: writes open their own transaction with an explicit BEGIN
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        # journal_mode=WAL persists in the database file; these do not
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=10737418240")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create articles table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS articles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    url TEXT UNIQUE NOT NULL,
-                    title TEXT,
-                    content TEXT,
-                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    processed BOOLEAN DEFAULT FALSE
-                )
-            ''')
-            
-            # Create summaries table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS summaries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    article_id INTEGER,
-                    summary TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (article_id) REFERENCES articles (id)
-                )
-            ''')
-            
-            # Create execution_logs table for tracking runs
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS execution_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    run_date DATE DEFAULT CURRENT_DATE,
-                    articles_scraped INTEGER DEFAULT 0,
-                    articles_summarized INTEGER DEFAULT 0,
-                    email_sent BOOLEAN DEFAULT FALSE,
-                    error_message TEXT,
-                    execution_time_seconds REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
+        conn = self._conn
+        cursor = conn.cursor()
+        
+        # page_size can't change under WAL, so an existing database drops back to a
+        # rollback journal and is rebuilt with VACUUM before WAL is re-enabled below
+        cursor.execute("PRAGMA page_size")
+        if cursor.fetchone()[0] != PAGE_SIZE:
+            cursor.execute("PRAGMA journal_mode=DELETE")
+            cursor.execute(f"PRAGMA page_size={PAGE_SIZE}")
+            cursor.execute("VACUUM")
+        
+        # Create articles table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT,
+                content TEXT,
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                processed BOOLEAN DEFAULT FALSE
+            )
+        ''')
+        
+        # Create summaries table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                article_id INTEGER,
+                summary TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (article_id) REFERENCES articles (id)
+            )
+        ''')
+        
+        # Create execution_logs table for tracking runs
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS execution_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_date DATE DEFAULT CURRENT_DATE,
+                articles_scraped INTEGER DEFAULT 0,
+                articles_summarized INTEGER DEFAULT 0,
+                email_sent BOOLEAN DEFAULT FALSE,
+                error_message TEXT,
+                execution_time_seconds REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Cache of generated summaries keyed by a SHA-256 of the article content, so
+        # re-scraped or cross-posted articles don't pay for a second API call
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS summary_cache (
+                content_hash TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Pages that rendered too little text to be worth summarizing (paywall stubs),
+        # remembered so later runs don't render them again
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS skipped_articles (
+                url TEXT PRIMARY KEY,
+                skipped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # A URL stored as an article is no longer a skipped one
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_unskip_stored
+            AFTER INSERT ON articles
+            BEGIN
+                DELETE FROM skipped_articles WHERE url = NEW.url;
+            END
+        ''')
+        
+        # Mark an article as processed as soon as a summary for it is inserted
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_mark_processed
+            AFTER INSERT ON summaries
+            BEGIN
+                UPDATE articles SET processed = 1 WHERE id = NEW.article_id;
+            END
+        ''')
+        
+        # Partial index covers only unprocessed rows and matches get_unprocessed_articles;
+        # the WHERE clause must be spelled "processed = 0" for the planner to use it
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_articles_unprocessed
+            ON articles (scraped_at DESC) WHERE processed = 0
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_summaries_created
+            ON summaries (created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_summaries_article_id
+            ON summaries (article_id)
+        ''')
+        
+        # WAL lets readers run alongside the writer and, with synchronous=NORMAL,
+        # only fsyncs on checkpoint instead of on every commit
+        cursor.execute("PRAGMA journal_mode=WAL")
     
     def insert_article(self, url: str, title: str, content: str) -> int:
         """Insert a new article into the database"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
+            conn.execute("BEGIN")
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO articles (url, title, content, scraped_at, processed)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (url, title, content, datetime.datetime.now(), False))
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute(UPSERT_ARTICLE_SQL + " RETURNING id", (url, title, content, datetime.datetime.now(), False))
+            return cursor.fetchone()[0]
     
-    def get_unprocessed_articles(self) -> List[Dict]:
-        """Get all articles that haven't been summarized yet"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, url, title, content FROM articles 
-                WHERE processed = FALSE
-                ORDER BY scraped_at DESC
-            ''')
-            
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    def insert_articles_many(self, rows: List[Tuple[str, str, str]]):
+        """Insert a batch of (url, title, content) articles in a single transaction"""
+        now = datetime.datetime.now()
+        with self._conn as conn:
+            conn.execute("BEGIN")
+            conn.executemany(UPSERT_ARTICLE_SQL, [(url, title, content, now, False) for url, title, content in rows])
+    
+    def insert_skipped_urls_many(self, urls: List[str]):
+        """Record a batch of article URLs that were skipped as too short, pruning expired skips"""
+        with self._conn as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "DELETE FROM skipped_articles WHERE skipped_at < datetime('now', ?)",
+                (f"-{SKIP_RETRY_DAYS} days",)
+            )
+            conn.executemany('''
+                INSERT INTO skipped_articles (url) VALUES (?)
+                ON CONFLICT(url) DO UPDATE SET skipped_at = CURRENT_TIMESTAMP
+            ''', [(url,) for url in urls])
+    
+    def get_all_urls(self) -> Set[str]:
+        """Get the URLs of every article already stored or skipped within SKIP_RETRY_DAYS"""
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            SELECT url FROM articles
+            UNION ALL
+            SELECT url FROM skipped_articles WHERE skipped_at >= datetime('now', ?)
+        ''', (f"-{SKIP_RETRY_DAYS} days",))
+        return {row[0] for row in cursor}
+    
+    def get_unprocessed_articles(self) -> Iterator[sqlite3.Row]:
+        """Yield id, url, title and content length of articles that haven't been summarized yet"""
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            SELECT id, url, title, LENGTH(content) AS length FROM articles 
+            WHERE processed = 0
+            ORDER BY scraped_at DESC
+        ''')
+        yield from cursor
+    
+    def get_content(self, article_id: int) -> Optional[str]:
+        """Get the body of a single article"""
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT content FROM articles WHERE id = ?', (article_id,))
+        row = cursor.fetchone()
+        return row['content'] if row else None
     
     def insert_summary(self, article_id: int, summary: str):
-        """Insert a summary for an article"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        """Insert a summary for an article (trg_mark_processed marks the article processed)"""
+        with self._conn as conn:
+            conn.execute("BEGIN")
+            conn.execute('''
                 INSERT INTO summaries (article_id, summary)
                 VALUES (?, ?)
             ''', (article_id, summary))
-            
-            # Mark article as processed
-            cursor.execute('''
-                UPDATE articles SET processed = TRUE WHERE id = ?
-            ''', (article_id,))
-            
-            conn.commit()
-    
-    def get_todays_summaries(self) -> List[Dict]:
+    
+    def insert_summaries_many(self, pairs: List[Tuple[int, str]]):
+        """Insert a batch of (article_id, summary) pairs in a single transaction"""
+        with self._conn as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany('''
+                INSERT INTO summaries (article_id, summary)
+                VALUES (?, ?)
+            ''', pairs)
+    
+    def get_cached_summary(self, content_hash: str) -> Optional[str]:
+        """Get a previously generated summary for content with the given hash"""
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            SELECT summary FROM summary_cache WHERE content_hash = ?
+        ''', (content_hash,))
+        row = cursor.fetchone()
+        return row['summary'] if row else None
+    
+    def cache_summaries_many(self, entries: List[Tuple[str, str]]):
+        """Store a batch of (content_hash, summary) pairs in the summary cache"""
+        with self._conn as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany('''
+                INSERT OR REPLACE INTO summary_cache (content_hash, summary)
+                VALUES (?, ?)
+            ''', entries)
+    
+    def get_todays_summaries(self) -> List[sqlite3.Row]:
         """Get all summaries created today"""
         today = datetime.datetime.now().date()
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT a.title, a.url, s.summary, s.created_at
-                FROM summaries s
-                JOIN articles a ON s.article_id = a.id
-                WHERE DATE(s.created_at) = ?
-                ORDER BY s.created_at DESC
-            ''', (today,))
-            
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # Compare against a [midnight, next midnight) range rather than DATE(created_at)
+        # so the lookup can use idx_summaries_created
+        start = datetime.datetime.combine(today, datetime.time.min)
+        end = start + datetime.timedelta(days=1)
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            SELECT a.title, a.url, s.summary, s.created_at
+            FROM summaries s
+            JOIN articles a ON s.article_id = a.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+            ORDER BY s.created_at DESC
+        ''', (start.isoformat(" "), end.isoformat(" ")))
+        return cursor.fetchall()
     
     def log_execution(self, articles_scraped: int, articles_summarized: int, 
                      email_sent: bool, execution_time: float, error_message: str = None):
         """Log execution details for monitoring"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        with self._conn as conn:
+            conn.execute("BEGIN")
+            conn.execute('''
                 INSERT INTO execution_logs 
                 (articles_scraped, articles_summarized, email_sent, execution_time_seconds, error_message)
                 VALUES (?, ?, ?, ?, ?)
             ''', (articles_scraped, articles_summarized, email_sent, execution_time, error_message))
-            conn.commit()
     
     def get_article_count(self) -> int:
         """Get total number of articles in database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM articles')
-            return cursor.fetchone()[0]
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM articles')
+        return cursor.fetchone()[0]
     
     def get_summary_count(self) -> int:
         """Get total number of summaries in database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM summaries')
-            return cursor.fetchone()[0]
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM summaries')
+        return cursor.fetchone()[0]
+    
+    def close(self):
+        """Close the underlying database connection"""
+        self._conn.close()
@@ -5,9 +5,7 @@ A simple utility to view and query the SQLite database
 """
 
 import sqlite3
-import argparse
-from datetime import datetime
-from tabulate import tabulate
+from datetime import datetime, time, timedelta
 import sys
 
 def connect_db(db_path="substack_articles.db"):
@@ -33,6 +31,7 @@ def show_tables(conn):
 
 def show_table_info(conn, table_name):
     """Show table structure and sample data"""
+    from tabulate import tabulate  # Imported lazily to keep --stats/--today startup fast
     cursor = conn.cursor()
     
     # Get table schema
@@ -63,6 +62,7 @@ def show_table_info(conn, table_name):
 
 def show_recent_executions(conn, limit=10):
     """Show recent execution logs"""
+    from tabulate import tabulate
     cursor = conn.cursor()
     cursor.execute("""
         SELECT 
@@ -92,6 +92,8 @@ def show_todays_summaries(conn):
     """Show summaries created today"""
     cursor = conn.cursor()
     today = datetime.now().date()
+    start = datetime.combine(today, time.min)
+    end = start + timedelta(days=1)
     
     cursor.execute("""
         SELECT 
@@ -101,9 +103,9 @@ def show_todays_summaries(conn):
             s.created_at
         FROM summaries s
         JOIN articles a ON s.article_id = a.id
-        WHERE DATE(s.created_at) = ?
+        WHERE s.created_at >= ? AND s.created_at < ?
         ORDER BY s.created_at DESC
-    """, (today,))
+    """, (start.isoformat(" "), end.isoformat(" ")))
     
     rows = cursor.fetchall()
     
@@ -122,26 +124,17 @@ def show_stats(conn):
     """Show database statistics"""
     cursor = conn.cursor()
     
-    # Article count
-    cursor.execute("SELECT COUNT(*) FROM articles;")
-    article_count = cursor.fetchone()[0]
-    
-    # Summary count
-    cursor.execute("SELECT COUNT(*) FROM summaries;")
-    summary_count = cursor.fetchone()[0]
-    
-    # Unprocessed articles
-    cursor.execute("SELECT COUNT(*) FROM articles WHERE processed = FALSE;")
-    unprocessed_count = cursor.fetchone()[0]
-    
-    # Execution count
-    cursor.execute("SELECT COUNT(*) FROM execution_logs;")
-    execution_count = cursor.fetchone()[0]
-    
-    # Last execution
-    cursor.execute("SELECT created_at FROM execution_logs ORDER BY created_at DESC LIMIT 1;")
-    last_execution = cursor.fetchone()
-    last_exec = last_execution[0] if last_execution else "Never"
+    # Gather every statistic in a single query
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM articles),
+            (SELECT COUNT(*) FROM summaries),
+            (SELECT COUNT(*) FROM articles WHERE processed = 0),
+            (SELECT COUNT(*) FROM execution_logs),
+            (SELECT created_at FROM execution_logs ORDER BY created_at DESC LIMIT 1);
+    """)
+    article_count, summary_count, unprocessed_count, execution_count, last_execution = cursor.fetchone()
+    last_exec = last_execution or "Never"
     
     print("📊 Database Statistics:")
     print(f"  Total Articles: {article_count}")
@@ -153,6 +146,7 @@ def show_stats(conn):
 
 def search_articles(conn, query, limit=10):
     """Search articles by title or content"""
+    from tabulate import tabulate
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -174,6 +168,8 @@ def search_articles(conn, query, limit=10):
     print()
 
 def main():
+    import argparse
+    
     parser = argparse.ArgumentParser(description="Database Viewer for Substack Scraper")
     parser.add_argument("--db", default="substack_articles.db", help="Database file path")
     parser.add_argument("--tables", action="store_true", help="Show all tables")
@@ -6,6 +6,7 @@ from email.mime.multipart import MIMEMultipart
 from pathlib import Path
 import html
 import re
+import shutil
 from dotenv import load_dotenv
 
 #TODO: Read from todays date subfolder
@@ -18,6 +19,20 @@ OUTPUT_FILENAME = f"summaries_{DATE}.txt"
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 SEPARATOR = "\n" + "-" * 50 + "\n"
+ERROR_PREFIX = "Error generating summary"
+SECTION_TEMPLATE = """
+            <div style="margin-bottom: 20px;">
+                <h2 style="color: #2c5282; font-size: 20px; margin: 0 0 10px 0; border-bottom: 2px solid #2c5282; padding-bottom: 5px;">{header}</h2>
+                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">{text}</p>
+            </div>
+            """
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_ESC_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+def partial_escape(t):
+    # Bug fix implementation for regex not being escaped: Escape &, <, >, but not *
+    return t.translate(_ESC_TABLE)
 
 def combine_summaries():
     print(">>> Starting summary combination process")
@@ -31,12 +46,14 @@ def combine_summaries():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # Get all .txt files from summary directory
-    summary_files = sorted([f for f in os.listdir(SUMMARY_DIR) if f.endswith('.txt')])
+    # scandir caches the entry type and full path, saving a stat and a join per file
+    with os.scandir(SUMMARY_DIR) as entries:
+        summary_files = sorted((e.name, e.path) for e in entries if e.is_file() and e.name.endswith('.txt'))
     if not summary_files:
         print(f"!!! No .txt files found in {SUMMARY_DIR}")
         return None
     
-    print(f">>> Found {len(summary_files)} summary files to combine: {', '.join(summary_files)}")
+    print(f">>> Found {len(summary_files)} summary files to combine: {', '.join(name for name, _ in summary_files)}")
     
     # Define output file path
     output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILENAME)
@@ -46,25 +63,33 @@ def combine_summaries():
             outfile.write(f"Combined Summaries for {DATE}\n")
             outfile.write("=" * 50 + "\n")
             
-            for idx, filename in enumerate(summary_files, 1):
-                input_path = os.path.join(SUMMARY_DIR, filename)
+            for idx, (filename, input_path) in enumerate(summary_files, 1):
                 print(f"--- [{idx}/{len(summary_files)}] Processing: {filename}")
                 
                 try:
                     with open(input_path, 'r', encoding='utf-8') as infile:
-                        content = infile.read().strip()
-                    
-                    if not content or content.startswith("Error generating summary"):
-                        print(f"    ! Skipping {filename}: Empty or contains error")
+                        # Only the head is needed to spot empty or failed summaries; keep
+                        # reading past leading whitespace until it holds enough text to check
+                        head = infile.read(64).lstrip()
+                        while len(head) < len(ERROR_PREFIX):
+                            chunk = infile.read(65536)
+                            if not chunk:
+                                break
+                            head = (head + chunk).lstrip()
+                        
+                        if not head or head.startswith(ERROR_PREFIX):
+                            print(f"    ! Skipping {filename}: Empty or contains error")
+                            outfile.write(SEPARATOR)
+                            outfile.write(f"Summary: {filename}\n")
+                            outfile.write(f"Status: Skipped - Empty or error\n")
+                            continue
+                        
+                        # Write separator, header, and content; the rest of the file is
+                        # streamed through a 64 KB buffer instead of read into memory
                         outfile.write(SEPARATOR)
                         outfile.write(f"Summary: {filename}\n")
-                        outfile.write(f"Status: Skipped - Empty or error\n")
-                        continue
-                    
-                    # Write separator, header, and content
-                    outfile.write(SEPARATOR)
-                    outfile.write(f"Summary: {filename}\n")
-                    outfile.write(content)
+                        outfile.write(head)
+                        shutil.copyfileobj(infile, outfile, 65536)
                     print(f"      Added: {filename}")
                 
                 except Exception as e:
@@ -80,6 +105,26 @@ def combine_summaries():
         print(f"!!! Failed to create combined file: {e}")
         return None
 
+def iter_sections(path):
+    """
+    Yield the SEPARATOR-delimited sections of a combined summaries file, reading
+    it line by line so only one section is held in memory at a time
+    """
+    boundary = SEPARATOR.strip("\n")
+    current = []
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.rstrip("\n") == boundary:
+                    # The newline ending the previous line belongs to the separator
+                    yield "".join(current)[:-1]
+                    current = []
+                else:
+                    current.append(line)
+        yield "".join(current).rstrip()
+    except Exception as e:
+        print(f"!!! Failed to read combined file for email body: {e}")
+
 def send_email(output_path, sender_email, sender_password, recipient_email):
     print(">>> Preparing to send email")
     
@@ -87,20 +132,13 @@ def send_email(output_path, sender_email, sender_password, recipient_email):
         print("!!! No combined file to send")
         return
     
-    # Read the combined summaries file
-    try:
-        with open(output_path, 'r', encoding='utf-8') as file:
-            content = file.read().strip()
-    except Exception as e:
-        print(f"!!! Failed to read combined file for email body: {e}")
-        content = "Error: Could not read the combined summaries file."
-    
-    # Split content into sections based on separator
-    sections = content.split(SEPARATOR)
+    # Stream the combined summaries file one section at a time
+    sections = iter_sections(output_path)
+    next(sections, None)  # Skip the initial header section
     formatted_sections = []
     
-    # Process sections, starting from the first valid summary (skip header)
-    for section in sections[1:]:  # Skip the initial header section
+    # Process sections, starting from the first valid summary
+    for section in sections:
         if not section.strip():
             continue
         
@@ -116,20 +154,13 @@ def send_email(output_path, sender_email, sender_password, recipient_email):
         if text.startswith("Status:"):
             text = html.escape(text)
         
-        def partial_escape(t):
-            # Bug fix implementation for regex not being escaped: Escape &, <, >, but not *
-            t = t.replace("&", "&amp;")
-            t = t.replace("<", "&lt;")
-            t = t.replace(">", "&gt;")
-            return t
-        
         safe_text = partial_escape(text)
         
         # Replace **text** with styled span
-        safe_text = re.sub(r'\*\*(.*?)\*\*', r'<span style="color: #2c5282; font-weight: bold;">\1</span>', safe_text)
+        safe_text = _BOLD_RE.sub(r'<span style="color: #2c5282; font-weight: bold;">\1</span>', safe_text)
         
         # Replace *text* with styled span
-        safe_text = re.sub(r'\*(.*?)\*', r'<span style="color: #2c827f;">\1</span>', safe_text)
+        safe_text = _ITALIC_RE.sub(r'<span style="color: #2c827f;">\1</span>', safe_text)
         safe_text = safe_text.replace("\n", "<br>")
         text = safe_text
         
@@ -145,22 +176,18 @@ def send_email(output_path, sender_email, sender_password, recipient_email):
         </div>
         """.format(DATE)
     else:
-        html_content = """
+        parts = ["""
         <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9; border: 1px solid #ddd; border-radius: 8px;">
             <h1 style="color: #333; font-size: 24px; margin-bottom: 20px;">Article Summaries - {}</h1>
-        """.format(DATE)
+        """.format(DATE)]
         
         for header, text in formatted_sections:
-            html_content += """
-            <div style="margin-bottom: 20px;">
-                <h2 style="color: #2c5282; font-size: 20px; margin: 0 0 10px 0; border-bottom: 2px solid #2c5282; padding-bottom: 5px;">{}</h2>
-                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">{}</p>
-            </div>
-            """.format(header, text)
+            parts.append(SECTION_TEMPLATE.format(header=header, text=text))
         
-        html_content += """
+        parts.append("""
         </div>
-        """
+        """)
+        html_content = "".join(parts)
     
     # Set up email
     msg = MIMEMultipart()
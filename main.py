@@ -2,7 +2,7 @@ import asyncio
 from playwright.async_api import async_playwright
 import os
 import re
-import csv
+from pathlib import Path
 from bs4 import BeautifulSoup
 
 #TODO: write articles into date subfolder
@@ -11,10 +11,18 @@ SEARCH_URL = "https://substack.com/search/artificial%20intelligence?searching=al
 OUTPUT_DIR = "substack_articles"
 CONTENT_SUBFOLDER = "article_content"
 CSV_FILE = "substack_ai_post_links.csv"
+MAX_CONCURRENT_PAGES = 8
+UNWANTED_SECTION_CLASSES = [
+    'share', 'subscribe', 'comments', 'post-meta', 'social',
+    'subscription', 'signup', 'caption', 'likes', 'ufi'
+]
+TEXT_TAGS = ['h1', 'h2', 'h3', 'h4', 'p', 'li']
+_SAFE_NAME_RE = re.compile(r'[^a-zA-Z0-9_-]')
+_WS_RE = re.compile(r'\s+')
 
 def sanitize_filename(title: str) -> str:
     # Remove special characters and limit filename to 100 characters
-    return re.sub(r'[^a-zA-Z0-9_-]', '', title)[:100]
+    return _SAFE_NAME_RE.sub('', title)[:100]
 
 async def scrape_and_extract_content():
     """
@@ -54,68 +62,82 @@ async def scrape_and_extract_content():
                     
         print(f">>> Found {len(article_data)} article links.")
         print(f">>> Saving links to CSV: {CSV_FILE}")
-        with open(CSV_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["url"])
-            writer.writeheader()
-            writer.writerows(article_data)
+        # Single-column CSV of https URLs, so no quoting is needed
+        csv_text = "url\n" + "".join(f"{e['url']}\n" for e in article_data)
+        await asyncio.to_thread(Path(CSV_FILE).write_text, csv_text, encoding="utf-8")
 
         print(">>> Beginning to visit each article for content extraction...")
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
 
-        for i, entry in enumerate(article_data, 1):
+        async def fetch_one(entry, i):
+            """Visit a single article and save its content, bounded by the semaphore"""
             url = entry["url"]
-            print(f"--- [{i}/{len(article_data)}] Visiting: {url}")
-            try:
-                article_page = await context.new_page()
-                await article_page.goto(url, wait_until="networkidle", timeout=60000)
-                await article_page.wait_for_timeout(2000)  # Extra wait for dynamic content
-
-                title = await article_page.title()
-                safe_name = sanitize_filename(title or f"article_{i}")
-
-                # Get the page content
-                html_content = await article_page.content()
-                soup = BeautifulSoup(html_content, 'html.parser')
-
-                # Extract main article content from div.body.markup or fallback to main
-                article_content = []
-                content_container = soup.find('div', class_='body markup') or soup.find('main')
-                if content_container:
-                    print(f"    Found content container for {url}")
-                    # Target headings, paragraphs, and other relevant tags
-                    for element in content_container.find_all(['h1', 'h2', 'h3', 'h4', 'p', 'li']):
-                        # Skip elements in unwanted sections
-                        if element.find_parent(class_=[
-                            'share', 'subscribe', 'comments', 'post-meta', 'social', 
-                            'subscription', 'signup', 'caption', 'likes', 'ufi']):
-                            continue
-                        # Skip script tags and their parents
-                        if element.name == 'script' or element.find_parent('script'):
-                            continue
-                        # Skip elements with specific classes or roles
-                        if element.get('class') and any(cls in element.get('class') for cls in [
-                            'button', 'image', 'graphic', 'newsletter', 'footer']):
-                            continue
-                        text = element.get_text(separator=' ', strip=True)
-                        if text:
-                            article_content.append(text)
-                else:
-                    print(f"!!! No content container found for {url}")
-
-                # Join content and clean up excessive whitespace
-                article_text = '\n\n'.join(article_content).strip()
-                article_text = re.sub(r'\s+', ' ', article_text)
-
-                # Save to text file in subfolder
-                content_path = os.path.join(OUTPUT_DIR, CONTENT_SUBFOLDER, f"{safe_name}.txt")
-                print(f"    Saving article content to: {content_path}")
-                with open(content_path, "w", encoding="utf-8") as f:
-                    f.write(article_text if article_text else "No content extracted")
-
-                print(f"    Done with: {safe_name}")
-                await article_page.close()
-
-            except Exception as e:
-                print(f"!!! Failed to scrape {url}: {e}")
+            async with semaphore:
+                print(f"--- [{i}/{len(article_data)}] Visiting: {url}")
+                article_page = None
+                try:
+                    article_page = await context.new_page()
+                    await article_page.goto(url, wait_until="networkidle", timeout=60000)
+                    await article_page.wait_for_timeout(2000)  # Extra wait for dynamic content
+
+                    title = await article_page.title()
+                    safe_name = sanitize_filename(title or f"article_{i}")
+
+                    # Get the page content
+                    html_content = await article_page.content()
+                    soup = BeautifulSoup(html_content, 'lxml')
+
+                    # Extract main article content from div.body.markup or fallback to main
+                    article_content = []
+                    content_container = soup.find('div', class_='body markup') or soup.find('main')
+                    if content_container:
+                        print(f"    Found content container for {url}")
+                        # Collect the text elements inside unwanted sections top-down rather
+                        # than walking every element's ancestors. Only descendants are skipped,
+                        # so an element carrying one of the classes itself is kept
+                        in_unwanted = {
+                            id(nested)
+                            for section in content_container.find_all(class_=UNWANTED_SECTION_CLASSES)
+                            for nested in section.find_all(TEXT_TAGS)
+                        }
+                        # Target headings, paragraphs, and other relevant tags
+                        for element in content_container.find_all(TEXT_TAGS):
+                            if id(element) in in_unwanted:
+                                continue
+                            # Skip elements with specific classes or roles
+                            if element.get('class') and any(cls in element.get('class') for cls in [
+                                'button', 'image', 'graphic', 'newsletter', 'footer']):
+                                continue
+                            text = element.get_text(separator=' ', strip=True)
+                            if text:
+                                article_content.append(text)
+                    else:
+                        print(f"!!! No content container found for {url}")
+
+                    # Join content and clean up excessive whitespace
+                    article_text = '\n\n'.join(article_content).strip()
+                    article_text = _WS_RE.sub(' ', article_text)
+
+                    # Save to text file in subfolder
+                    content_path = os.path.join(OUTPUT_DIR, CONTENT_SUBFOLDER, f"{safe_name}.txt")
+                    print(f"    Saving article content to: {content_path}")
+                    # Write off the event loop so other pages keep loading meanwhile
+                    await asyncio.to_thread(
+                        Path(content_path).write_text,
+                        article_text if article_text else "No content extracted",
+                        encoding="utf-8",
+                    )
+
+                    print(f"    Done with: {safe_name}")
+
+                except Exception as e:
+                    print(f"!!! Failed to scrape {url}: {e}")
+                finally:
+                    if article_page:
+                        await article_page.close()
+
+        # Pages share one browser context; the semaphore caps how many are open at once
+        await asyncio.gather(*(fetch_one(entry, i) for i, entry in enumerate(article_data, 1)), return_exceptions=True)
 
         await browser.close()
         print(">>> All articles processed. Browser closed.")
@@ -1,16 +1,23 @@
 import asyncio
+import hashlib
+import html
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import os
 import re
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from database import SubstackDatabase
 import logging
+from typing import Tuple
 
 # Load environment variables
 load_dotenv()
@@ -21,11 +28,62 @@ OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 MODEL = "deepseek/deepseek-r1-0528:free"
 SUMMARY_LENGTH = "200 word"
 MAX_ARTICLES = 80
+MIN_ARTICLE_LENGTH = 200
+MAX_CONTENT_CHARS = 24000  # ~6k tokens, plenty of context for a 200 word summary
+SYSTEM_PROMPT = f"Summarize the provided article as a professional AI researcher, focusing on key insights, technical advancements, and implications for the field. Deliver a concise {SUMMARY_LENGTH} summary, prioritizing critical details like model capabilities, benchmark results, architectural innovations, and governance trends. Exclude filler words, irrelevant details, and any reference to this prompt. Use precise, technical language suitable for an expert audience."
+MAX_CONCURRENT_PAGES = 8
+BROWSER_VIEWPORT = {"width": 1280, "height": 900}  # Desktop layout, avoids Substack's mobile re-render
+MAX_SUMMARY_WORKERS = 8
+_FILENAME_RE = re.compile(r'[^a-zA-Z0-9_-]')
+
+# Everything in the OpenRouter request except the article itself is the same for every call
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+_BASE_PAYLOAD = {
+    "model": MODEL,
+    "max_tokens": 2000,
+    "temperature": 0.7
+}
+
+# Article elements inside these sections, or carrying these classes, are not article text
+SKIP_ANCESTOR_SELECTOR = (
+    '.share, .subscribe, .comments, .post-meta, .social, '
+    '.subscription, .signup, .caption, .likes, .ufi'
+)
+SKIP_ELEMENT_SELECTOR = '.button, .image, .graphic, .newsletter, .footer'
+
+# Runs inside the article page and returns the text of each heading, paragraph and list
+# item in the article body, or null when the page has no recognisable body
+EXTRACT_TEXT_JS = """
+([skipAncestorSelector, skipElementSelector]) => {
+    const container = document.querySelector('div.body.markup') || document.querySelector('main');
+    if (!container) {
+        return null;
+    }
+    return Array.from(container.querySelectorAll('h1, h2, h3, h4, p, li'))
+        .filter(el => !el.matches(skipElementSelector)
+            && !(el.parentElement && el.parentElement.closest(skipAncestorSelector)))
+        .map(el => el.innerText)
+        .filter(Boolean);
+}
+"""
+
+# Requests that never affect the extracted article text
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOSTS = ("google-analytics", "googletagmanager", "segment.io", "doubleclick")
 
 # Email configuration
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 
+EMAIL_SECTION_TEMPLATE = """
+            <div style="margin-bottom: 20px;">
+                <h2 style="color: #2c5282; font-size: 20px; margin: 0 0 10px 0; border-bottom: 2px solid #2c5282; padding-bottom: 5px;">
+                    <a href="{url}" style="color: #2c5282; text-decoration: none;">{title}</a>
+                </h2>
+                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">{summary}</p>
+            </div>
+            """
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,6 +94,18 @@ logging.basicConfig(
     ]
 )
 
+def hash_content(content: str) -> str:
+    """Stable key for the summary cache; a digest keeps the key small regardless of article size"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+async def block_unneeded_requests(route):
+    """Abort images, fonts, media, stylesheets and tracker requests; let everything else through"""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
 class SubstackScraper:
     def __init__(self):
         self.db = SubstackDatabase()
@@ -47,15 +117,34 @@ class SubstackScraper:
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable not set")
         
+        # Reuse one keep-alive connection pool for all OpenRouter calls, retrying
+        # rate limits and transient server errors with backoff
+        self.http = requests.Session()
+        self.http.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["POST"])
+        self.http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=retry))
+        
         self.start_time = time.time()
         self.articles_scraped = 0
         self.articles_summarized = 0
         self.email_sent = False
         self.error_message = None
+        # Articles are collected here as pages finish and written in one transaction
+        # at the end of scrape_articles
+        self._pending_articles = []
+        # URLs of pages too short to store, recorded so they aren't rendered again
+        self._skipped_urls = []
+        # content_hash -> Future for summaries requested in the current batch
+        self._pending_summaries = {}
+        self._summary_lock = threading.Lock()
     
     def sanitize_filename(self, title: str) -> str:
         """Remove special characters and limit filename length"""
-        return re.sub(r'[^a-zA-Z0-9_-]', '', title)[:100]
+        return _FILENAME_RE.sub('', title)[:100]
     
     async def scrape_articles(self):
         """Scrape articles from Substack search results"""
@@ -64,8 +153,12 @@ class SubstackScraper:
         try:
             async with async_playwright() as p:
                 logging.info("Launching browser...")
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context()
+                browser = await p.chromium.launch(
+                    headless=True,
+                    args=["--disable-blink-features=AutomationControlled"]
+                )
+                context = await browser.new_context(viewport=BROWSER_VIEWPORT)
+                await context.route("**/*", block_unneeded_requests)
                 page = await context.new_page()
 
                 logging.info(f"Navigating to search page: {SEARCH_URL}")
@@ -75,71 +168,29 @@ class SubstackScraper:
                 await page.wait_for_selector('div.linkRow-ddH7S0.reader2-post-container', timeout=30000)
 
                 logging.info("Extracting article links from the search results...")
-                posts = await page.query_selector_all('div.linkRow-ddH7S0.reader2-post-container a[href^="https://"]')
+                # Slice and read the hrefs in the page so only the first MAX_ARTICLES
+                # strings cross back, instead of an element handle per result row
+                hrefs = await page.locator('div.linkRow-ddH7S0.reader2-post-container a[href^="https://"]').evaluate_all(
+                    "(els, max) => els.slice(0, max).map(e => e.getAttribute('href'))", MAX_ARTICLES
+                )
+                article_urls = [href.strip() for href in hrefs if href]
 
-                article_urls = []
-                count = 0
-                for post in posts:
-                    count += 1
-                    if count > MAX_ARTICLES:
-                        break
-                    href = await post.get_attribute("href")
-                    if href:
-                        article_urls.append(href.strip())
-                        
                 logging.info(f"Found {len(article_urls)} article links.")
 
-                logging.info("Beginning to visit each article for content extraction...")
-                for i, url in enumerate(article_urls, 1):
-                    logging.info(f"--- [{i}/{len(article_urls)}] Visiting: {url}")
-                    try:
-                        article_page = await context.new_page()
-                        await article_page.goto(url, wait_until="networkidle", timeout=60000)
-                        await article_page.wait_for_timeout(2000)
-
-                        title = await article_page.title()
-                        safe_name = self.sanitize_filename(title or f"article_{i}")
-
-                        # Get the page content
-                        html_content = await article_page.content()
-                        soup = BeautifulSoup(html_content, 'html.parser')
-
-                        # Extract main article content
-                        article_content = []
-                        content_container = soup.find('div', class_='body markup') or soup.find('main')
-                        if content_container:
-                            logging.info(f"    Found content container for {url}")
-                            for element in content_container.find_all(['h1', 'h2', 'h3', 'h4', 'p', 'li']):
-                                # Skip elements in unwanted sections
-                                if element.find_parent(class_=[
-                                    'share', 'subscribe', 'comments', 'post-meta', 'social', 
-                                    'subscription', 'signup', 'caption', 'likes', 'ufi']):
-                                    continue
-                                if element.name == 'script' or element.find_parent('script'):
-                                    continue
-                                if element.get('class') and any(cls in element.get('class') for cls in [
-                                    'button', 'image', 'graphic', 'newsletter', 'footer']):
-                                    continue
-                                text = element.get_text(separator=' ', strip=True)
-                                if text:
-                                    article_content.append(text)
-                        else:
-                            logging.warning(f"!!! No content container found for {url}")
-
-                        # Join content and clean up excessive whitespace
-                        article_text = '\n\n'.join(article_content).strip()
-                        article_text = re.sub(r'\s+', ' ', article_text)
-
-                        if article_text and article_text != "No content extracted":
-                            # Save to database
-                            self.db.insert_article(url, title, article_text)
-                            self.articles_scraped += 1
-                            logging.info(f"    Saved article: {safe_name}")
+                # Skip articles stored on a previous run before paying to render them
+                existing_urls = self.db.get_all_urls()
+                new_urls = [url for url in article_urls if url not in existing_urls]
+                logging.info(f"Skipping {len(article_urls) - len(new_urls)} already stored articles.")
+                article_urls = new_urls
 
-                        await article_page.close()
-
-                    except Exception as e:
-                        logging.error(f"!!! Failed to scrape {url}: {e}")
+                logging.info("Beginning to visit each article for content extraction...")
+                # Pages share one browser context; the semaphore caps how many are open at once
+                semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+                await asyncio.gather(
+                    *(self.scrape_article(context, semaphore, url, i, len(article_urls))
+                      for i, url in enumerate(article_urls, 1)),
+                    return_exceptions=True
+                )
 
                 await browser.close()
                 logging.info("Browser closed. Scraping completed.")
@@ -147,27 +198,78 @@ class SubstackScraper:
         except Exception as e:
             logging.error(f"Error during scraping: {e}")
             self.error_message = f"Scraping error: {str(e)}"
+        finally:
+            # Save everything scraped or skipped so far, even if scraping
+            # failed or was cancelled part-way through
+            try:
+                if self._pending_articles:
+                    self.db.insert_articles_many(self._pending_articles)
+                    self.articles_scraped += len(self._pending_articles)
+                    logging.info(f"Saved {len(self._pending_articles)} articles to the database.")
+                    self._pending_articles.clear()
+                if self._skipped_urls:
+                    self.db.insert_skipped_urls_many(self._skipped_urls)
+                    logging.info(f"Recorded {len(self._skipped_urls)} skipped articles.")
+                    self._skipped_urls.clear()
+            except Exception as e:
+                logging.error(f"Error saving scraped articles: {e}")
+                self.error_message = f"Scraping error: {str(e)}"
+    
+    async def scrape_article(self, context, semaphore: asyncio.Semaphore, url: str, i: int, total: int):
+        """Visit a single article and queue (url, title, content) for saving if text was extracted"""
+        async with semaphore:
+            logging.info(f"--- [{i}/{total}] Visiting: {url}")
+            article_page = None
+            try:
+                article_page = await context.new_page()
+                # Substack keeps long-poll connections open, so networkidle only adds idle
+                # time; wait for the DOM and then for the article body instead of sleeping
+                await article_page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                await article_page.wait_for_selector('div.body.markup, main', timeout=15000, state='attached')
+
+                title = await article_page.title()
+                safe_name = self.sanitize_filename(title or f"article_{i}")
+
+                # Extract main article content inside the page rather than serializing the
+                # DOM and parsing it again in Python
+                article_content = await article_page.evaluate(
+                    EXTRACT_TEXT_JS, [SKIP_ANCESTOR_SELECTOR, SKIP_ELEMENT_SELECTOR]
+                )
+                if article_content is not None:
+                    logging.info(f"    Found content container for {url}")
+                else:
+                    logging.warning(f"!!! No content container found for {url}")
+                    article_content = []
+
+                # split()/join collapses runs of whitespace in one pass
+                article_text = ' '.join(' '.join(article_content).split())
+
+                # Anything shorter is a paywall stub or empty page, not worth an LLM call
+                if len(article_text) >= MIN_ARTICLE_LENGTH:
+                    self._pending_articles.append((url, title, article_text))
+                    logging.info(f"    Extracted article: {safe_name}")
+                else:
+                    logging.warning(f"!!! Skipping {url}: only {len(article_text)} characters extracted")
+                    self._skipped_urls.append(url)
+
+            except Exception as e:
+                logging.error(f"!!! Failed to scrape {url}: {e}")
+            finally:
+                if article_page:
+                    await article_page.close()
     
     def get_summary(self, content: str) -> str:
         """Generate AI summary using OpenRouter API"""
+        # Input tokens drive cost and latency; the opening of an article carries enough for the summary
+        content = content[:MAX_CONTENT_CHARS]
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": MODEL,
-                "messages": [
-                    {"role": "system", "content": f"Summarize the provided article as a professional AI researcher, focusing on key insights, technical advancements, and implications for the field. Deliver a concise {SUMMARY_LENGTH} summary, prioritizing critical details like model capabilities, benchmark results, architectural innovations, and governance trends. Exclude filler words, irrelevant details, and any reference to this prompt. Use precise, technical language suitable for an expert audience."},
-                    {"role": "user", "content": content}
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.7
-            }
-            response = requests.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=30)
+            payload = {**_BASE_PAYLOAD, "messages": [_SYSTEM_MESSAGE, {"role": "user", "content": content}]}
+            # orjson serializes straight to bytes and parses the raw body, skipping
+            # the str round-trips of the stdlib json path used by json=/.json()
+            response = self.http.post(OPENROUTER_API_URL, data=orjson.dumps(payload), timeout=30)
             response.raise_for_status()
 
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             if "choices" not in response_data or not response_data["choices"]:
                 return f"!!! Error generating summary: No choices in API response"
             
@@ -187,27 +289,75 @@ class SubstackScraper:
             logging.error(f"Error generating summary: {e}")
             return f"!!! Error generating summary: {str(e)}"
     
+    def summarize_article(self, article_id: int) -> Tuple[str, str, bool]:
+        """
+        Load one article's content and summarize it, reusing a cached summary when one exists.
+        Returns (content_hash, summary, from_cache)
+        """
+        content = self.db.get_content(article_id)
+        content_hash = hash_content(content)
+        cached_summary = self.db.get_cached_summary(content_hash)
+        if cached_summary:
+            return content_hash, cached_summary, True
+        
+        # The cache is only written once the whole batch finishes, so identical articles
+        # in the same run share the first worker's request instead of each calling the API
+        with self._summary_lock:
+            pending = self._pending_summaries.get(content_hash)
+            if pending is None:
+                self._pending_summaries[content_hash] = owned = Future()
+        if pending is not None:
+            return content_hash, pending.result(), True
+        
+        try:
+            summary = self.get_summary(content)
+        except Exception as e:
+            owned.set_exception(e)
+            raise
+        owned.set_result(summary)
+        return content_hash, summary, False
+    
     def summarize_articles(self):
         """Summarize all unprocessed articles"""
         logging.info("Starting article summarization process")
         
-        unprocessed_articles = self.db.get_unprocessed_articles()
-        logging.info(f"Found {len(unprocessed_articles)} unprocessed articles")
-
-        for article in unprocessed_articles:
-            try:
-                logging.info(f"Summarizing: {article['title']}")
-                summary = self.get_summary(article['content'])
-                
-                if not summary.startswith("!!! Error"):
-                    self.db.insert_summary(article['id'], summary)
-                    self.articles_summarized += 1
-                    logging.info(f"    Summary generated successfully")
-                else:
-                    logging.warning(f"    Summary generation failed: {summary}")
+        summaries = []
+        new_cache_entries = []
+        # Summaries are I/O-bound on the API, so request them from a thread pool whose
+        # size also caps in-flight requests; database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=MAX_SUMMARY_WORKERS) as executor:
+            # Only ids and titles are held here; each worker loads its own article body
+            futures = {}
+            for article in self.db.get_unprocessed_articles():
+                logging.info(f"Summarizing: {article['title']} ({article['length']} chars)")
+                futures[executor.submit(self.summarize_article, article['id'])] = article
+            logging.info(f"Found {len(futures)} unprocessed articles")
+            
+            for future in as_completed(futures):
+                article = futures[future]
+                try:
+                    content_hash, summary, from_cache = future.result()
                     
-            except Exception as e:
-                logging.error(f"Error processing article {article['id']}: {e}")
+                    # A duplicate of a failed in-flight request shares its error string
+                    if summary.startswith("!!! Error"):
+                        logging.warning(f"    Summary generation failed: {summary}")
+                    elif from_cache:
+                        summaries.append((article['id'], summary))
+                        logging.info(f"    Using cached summary: {article['title']}")
+                    else:
+                        summaries.append((article['id'], summary))
+                        new_cache_entries.append((content_hash, summary))
+                        logging.info(f"    Summary generated successfully: {article['title']}")
+                        
+                except Exception as e:
+                    logging.error(f"Error processing article {article['id']}: {e}")
+        
+        # Save all summaries to the database in one transaction
+        self.db.insert_summaries_many(summaries)
+        self.db.cache_summaries_many(new_cache_entries)
+        # Successful summaries are in the cache now; failed ones get retried next batch
+        self._pending_summaries.clear()
+        self.articles_summarized += len(summaries)
     
     def send_email(self):
         """Send email with today's summaries"""
@@ -223,30 +373,21 @@ class SubstackScraper:
             return
         
         # Create HTML email content
-        html_content = f"""
+        parts = [f"""
         <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f9f9f9; border: 1px solid #ddd; border-radius: 8px;">
             <h1 style="color: #333; font-size: 24px; margin-bottom: 20px;">AI Article Summaries - {summaries[0]['created_at'][:10]}</h1>
-        """
+        """]
         
         for summary_data in summaries:
             title = summary_data['title'] or "Untitled Article"
-            summary = summary_data['summary']
-            url = summary_data['url']
             
             # Clean up the summary text for HTML
-            safe_summary = summary.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-            safe_summary = safe_summary.replace("\n", "<br>")
+            safe_summary = html.escape(summary_data['summary']).replace("\n", "<br>")
             
-            html_content += f"""
-            <div style="margin-bottom: 20px;">
-                <h2 style="color: #2c5282; font-size: 20px; margin: 0 0 10px 0; border-bottom: 2px solid #2c5282; padding-bottom: 5px;">
-                    <a href="{url}" style="color: #2c5282; text-decoration: none;">{title}</a>
-                </h2>
-                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">{safe_summary}</p>
-            </div>
-            """
+            parts.append(EMAIL_SECTION_TEMPLATE.format(url=summary_data['url'], title=title, summary=safe_summary))
         
-        html_content += "</div>"
+        parts.append("</div>")
+        html_content = "".join(parts)
         
         # Set up email
         msg = MIMEMultipart()
@@ -311,7 +452,10 @@ class SubstackScraper:
 async def main():
     """Main entry point"""
     scraper = SubstackScraper()
-    await scraper.run_full_pipeline()
+    try:
+        await scraper.run_full_pipeline()
+    finally:
+        scraper.db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
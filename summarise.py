@@ -2,8 +2,11 @@ import os
 import re
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 import json
+import logging
 
 #TODO: read from todays date subfolder and write to todays date subfolder
 
@@ -16,11 +19,28 @@ OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 API_KEY = os.getenv(env)  # Ensure your OpenAI API key is set as an environment variable
 MODEL = "deepseek/deepseek-r1-0528:free"
 SUMMARY_LENGTH = "200 word"
+_FILENAME_RE = re.compile(r'[^a-zA-Z0-9_-]')
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Shared keep-alive connection pool for all OpenRouter calls, retrying rate limits
+# and transient server errors with backoff
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["POST"])
+))
 
 
 def sanitize_filename(title: str) -> str:
     # Remove special characters and limit filename to 100 characters
-    return re.sub(r'[^a-zA-Z0-9_-]', '', title)[:100]
+    return _FILENAME_RE.sub('', title)[:100]
 
 def get_summary(api_key: str, content: str) -> str:
     """
@@ -46,7 +66,7 @@ def get_summary(api_key: str, content: str) -> str:
             "max_tokens": 2000,  # Adjust based on desired summary length
             "temperature": 0.7
         }
-        response = requests.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=30)
+        response = _session.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=30)
         
         response.raise_for_status()  # Raise exception for bad status codes (e.g., 4xx, 5xx)
 
@@ -78,11 +98,11 @@ def get_summary(api_key: str, content: str) -> str:
 
 
 def summarize_articles():
-    print(">>> Starting article summarisation process")
+    logging.info("Starting article summarisation process")
     
     # Ensure input directory exists
     if not os.path.exists(INPUT_DIR):
-        print(f"!!! Input directory {INPUT_DIR} does not exist")
+        logging.error(f"!!! Input directory {INPUT_DIR} does not exist")
         return
     
     # Create output directory
@@ -91,16 +111,16 @@ def summarize_articles():
     # Get OpenRouter API key
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
-        print("!!! OPENROUTER_API_KEY environment variable not set. Please set it and try again.")
+        logging.error("!!! OPENROUTER_API_KEY environment variable not set. Please set it and try again.")
         return
 
     # Get all .txt files from input directory
     text_files = [f for f in os.listdir(INPUT_DIR) if f.endswith('.txt')]
-    print(f">>> Found {len(text_files)} text files to summarize")
+    logging.info(f"Found {len(text_files)} text files to summarize")
 
     for i, filename in enumerate(text_files, 1):
         input_path = os.path.join(INPUT_DIR, filename)
-        print(f"--- [{i}/{len(text_files)}] Processing: {filename}")
+        logging.info(f"--- [{i}/{len(text_files)}] Processing: {filename}")
         
         try:
             # Read the article content
@@ -108,28 +128,28 @@ def summarize_articles():
                 content = f.read().strip()
             
             if not content or content == "No content extracted":
-                print(f"     No content found in {filename}, skipping")
+                logging.warning(f"    No content found in {filename}, skipping")
                 continue
 
             # Generate summary
-            print(f"    Sending content to OpenRouter for summarisation...")
+            logging.info("    Sending content to OpenRouter for summarisation...")
             summary = get_summary(api_key, content)
             
             # Save summary to output directory
             safe_filename = sanitize_filename(Path(filename).stem) + "_summary.txt"
             output_path = os.path.join(OUTPUT_DIR, safe_filename)
-            print(f"    Saving summary to: {output_path}")
+            logging.info(f"    Saving summary to: {output_path}")
             
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(summary)
             
-            print(f"     Done with: {filename}")
+            logging.info(f"    Done with: {filename}")
         
         except Exception as e:
-            print(f"     Failed to process {filename}: {e}")
+            logging.error(f"!!! Failed to process {filename}: {e}")
 
-    print(">>> All articles processed.")
-    print(f">>> Summaries saved in: {OUTPUT_DIR}")
+    logging.info("All articles processed.")
+    logging.info(f"Summaries saved in: {OUTPUT_DIR}")
 
 if __name__ == "__main__":
     summarize_articles()
\ No newline at end of file